@@ -0,0 +1,110 @@
+""" Defines the Alphabet class, which numbers the characters seen by a model.
+
+    Grams are stored as integers rather than strings: each character is
+    replaced by its index in an Alphabet, and a gram of length n is packed into
+    a single integer, as an n-digit number in base len(alphabet).  Since the
+    length of a gram is always known from context (usually it is n_max), no
+    marker is needed for where the digits start.
+"""
+
+
+class Alphabet:
+    """ An Alphabet maps characters to small integers, in the order they were seen.
+
+    Indices never change once given out, so the alphabet can only grow.  Note that
+    the default base for packing grams is the current size of the alphabet; a
+    packed gram is only meaningful together with the base it was packed in.
+    """
+
+    def __init__(self, symbols=""):
+        """Creates an Alphabet, optionally already containing the given characters"""
+        self.symbols = []
+        self.indices = {}
+        for symbol in symbols:
+            self.index(symbol)
+
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+    def __contains__(self, symbol):
+        return symbol in self.indices
+
+
+    def __str__(self):
+        return "".join(self.symbols)
+
+
+    def index(self, symbol):
+        """Returns the index of the character, adding it to the alphabet if needed"""
+        index = self.indices.get(symbol)
+        if index is None:
+            index = len(self.symbols)
+            self.indices[symbol] = index
+            self.symbols.append(symbol)
+        return index
+
+
+    def get(self, symbol, default=None):
+        """Returns the index of the character, or default if it has not been seen"""
+        return self.indices.get(symbol, default)
+
+
+    def translation(self, other):
+        """ Returns a list mapping indices in this alphabet to those in other.
+
+        Characters missing from other are mapped to None.
+        """
+        return [other.get(symbol) for symbol in self.symbols]
+
+
+    def base(self, base=None):
+        """The base to pack grams in; by default the size of the alphabet"""
+        if base is None:
+            base = len(self.symbols)
+        return max(base, 1)
+
+
+    def cached(self, cache, key, compute):
+        """ Returns compute(), remembered in the dict cache under key.
+
+        Anything holding grams packed in this alphabet's default base is
+        only valid until the alphabet grows, so the value is computed again
+        whenever the size of the alphabet has changed since it was stored.
+        """
+        size = len(self.symbols)
+        entry = cache.get(key)
+        if entry is None or entry[0] != size:
+            entry = (size, compute())
+            cache[key] = entry
+        return entry[1]
+
+
+    def pack(self, indices, base=None):
+        """Packs a sequence of character indices into a single integer"""
+        base = self.base(base)
+        code = 0
+        for index in indices:
+            code = code * base + index
+        return code
+
+
+    def unpack(self, code, length, base=None):
+        """Returns the list of character indices of a packed gram of the given length"""
+        base = self.base(base)
+        indices = [0] * length
+        for position in range(length - 1, -1, -1):
+            code, indices[position] = divmod(code, base)
+        return indices
+
+
+    def encode(self, gram):
+        """Packs a string, adding any new characters to the alphabet"""
+        indices = [self.index(symbol) for symbol in gram]
+        return self.pack(indices)
+
+
+    def decode(self, code, length, base=None):
+        """Returns the string represented by a packed gram of the given length"""
+        return "".join(self.symbols[index] for index in self.unpack(code, length, base))
@@ -0,0 +1,50 @@
+""" Measures how long quick.py takes from process start to its first answer.
+
+    Usage:
+        python bench_startup.py SNAPSHOT [RUNS]
+
+    Runs quick.py RUNS times (default 20) on a short string with the given
+    snapshot, each in a new process, and prints the fastest, median and
+    slowest times.  Exits with status 1 if the median is over BUDGET.
+"""
+import os
+import sys
+import time
+import subprocess
+
+BUDGET = 0.1   # seconds
+TEXT = "The quick brown fox jumps over the lazy dog."
+USAGE = "usage: python bench_startup.py SNAPSHOT [RUNS]"
+QUICK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quick.py")
+
+
+def time_run(snapshot):
+    """Returns the time taken by one run of quick.py, in seconds"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, QUICK, snapshot, TEXT],
+                   stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main(argv):
+    if not argv:
+        print(USAGE)
+        return 2
+    snapshot = argv[0]
+    runs = int(argv[1]) if len(argv) > 1 else 20
+    time_run(snapshot)   # Warm up, so bytecode is already compiled
+    times = sorted(time_run(snapshot) for _ in range(runs))
+    median = times[len(times) // 2]
+    print("startup to first answer over {} runs:".format(runs))
+    print("\tfastest {:7.1f} ms".format(times[0] * 1000))
+    print("\tmedian  {:7.1f} ms".format(median * 1000))
+    print("\tslowest {:7.1f} ms".format(times[-1] * 1000))
+    print("\tbudget  {:7.1f} ms".format(BUDGET * 1000))
+    if median > BUDGET:
+        print("Over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,182 @@
+""" Defines the ModelBundle class, which stores the counts of many Languages in one file.
+
+    A bundle file starts with a line holding a magic string, the version of the
+    format, and the length in bytes of the table of contents.  The table of
+    contents is JSON, holding the alphabet shared by every language in the
+    bundle, and for each language the header of its cache (see
+    Language.to_cache) along with the offset and length of its section.
+    Each section is the JSON list of one language's packed grams.
+
+    Every section's grams are packed in the whole shared alphabet, so a gram
+    has the same code in every section, and a section can be used as it is by
+    Languages numbering their characters with the bundle's alphabet.  When a
+    language adds new characters, the other sections are repacked on saving.
+"""
+import os
+import json
+from alphabet import Alphabet
+
+MAGIC = "ngrams-bundle"
+VERSION = 1
+
+# Entries in the table of contents that are not part of the cache header
+_SECTION_KEYS = ("offset", "length", "base")
+
+
+def _repack(grams, n, old_base, new_base):
+    """Returns the list of (packed n-gram, count) pairs, packed in a new base"""
+    alphabet = Alphabet()   # Packing doesn't depend on the characters
+    return [(alphabet.pack(alphabet.unpack(code, n, old_base), new_base), count)
+            for (code, count) in grams]
+
+
+def atomic_write(filename, write):
+    """ Writes a file under a temporary name, then renames it into place.
+
+    Readers of the file never see a partly written version, and if writing
+    fails the old version is left as it was.
+    Args:
+        filename: The name of the file to write
+        write:    A function writing the contents to the binary file it's given
+    """
+    import tempfile   # Only needed when saving, which most runs don't do
+    directory = os.path.dirname(os.path.abspath(filename))
+    (fd, temp_name) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_name, 0o644)
+        os.replace(temp_name, filename)
+    except BaseException:
+        os.remove(temp_name)
+        raise
+
+
+class ModelBundle:
+    """ A ModelBundle gives access to the languages stored in a bundle file.
+
+    Only the table of contents is read when a ModelBundle is created.  Each
+    language's section can then be read independently, with loader().
+
+    The file is kept open, and bundles are only ever written by replacing the
+    whole file, so a ModelBundle can keep reading its version of the file while
+    another process saves a new one.
+    """
+
+    def __init__(self, filename, read=True):
+        """ Opens a bundle file and reads its table of contents.
+
+        Args:
+            filename: The name of the bundle file
+            read:     If False, or if the file does not exist, the bundle
+                      starts out empty
+        Raises:
+            ValueError if the file exists but is not a valid bundle.
+        """
+        self.filename = filename
+        self.alphabet = ""
+        self.languages = {}
+        self._file = None
+        self._data_start = 0
+        if not read or not os.path.isfile(filename):
+            return
+        self._file = open(filename, "rb")
+        try:
+            self._read_toc()
+        except (ValueError, KeyError, TypeError) as error:
+            self.close()
+            raise ValueError("{} is not a valid model bundle".format(filename)) from error
+
+
+    def _read_toc(self):
+        line = self._file.readline().decode("ascii").split()
+        if len(line) != 3 or line[0] != MAGIC or line[1] != str(VERSION):
+            raise ValueError("bad first line")
+        toc = json.loads(self._file.read(int(line[2])).decode("utf-8"))
+        if (not isinstance(toc, dict) or not isinstance(toc["alphabet"], str)
+                or not isinstance(toc["languages"], dict)):
+            raise TypeError("bad table of contents")
+        self.alphabet = toc["alphabet"]
+        self.languages = toc["languages"]
+        self._data_start = self._file.tell()
+
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+    def header(self, name):
+        """Returns the cache header of a language, as in Language.to_cache"""
+        entry = self.languages[name]
+        header = {key: entry[key] for key in entry if key not in _SECTION_KEYS}
+        header["alphabet"] = self.alphabet[:entry["base"]]
+        return header
+
+
+    def _read_section(self, name):
+        entry = self.languages[name]
+        self._file.seek(self._data_start + entry["offset"])
+        return self._file.read(entry["length"])
+
+
+    def loader(self, name):
+        """Returns a function that loads the grams of a language, for CachedLanguage"""
+        return lambda: json.loads(self._read_section(name).decode("utf-8"))
+
+
+    def save(self, updates):
+        """ Writes the bundle file, with the given languages added or replaced.
+
+        The file is read again first, so languages saved by other processes
+        since this bundle was opened are kept.  The new file is written under
+        a temporary name and then renamed, so readers never see a partly
+        written bundle.  This ModelBundle keeps reading the old version.
+        Args:
+            updates: A dict mapping language names to tuples of the form
+                (Language, list of filenames it was made from)
+        Raises:
+            ValueError if the file exists but is not a valid bundle, in which
+            case it is left alone.
+        """
+        current = ModelBundle(self.filename)
+        alphabet = Alphabet(current.alphabet)
+        for name in updates:
+            for symbol in updates[name][0].alphabet.symbols:
+                alphabet.index(symbol)
+        base = len(alphabet)
+        entries = {}
+        sections = []
+        offset = 0
+        for name in current.languages:
+            if name in updates:
+                continue
+            entry = current.languages[name]
+            section = current._read_section(name)
+            if entry["base"] != base:
+                grams = _repack(json.loads(section.decode("utf-8")), entry["n"],
+                                entry["base"], base)
+                section = json.dumps(grams).encode("utf-8")
+            entries[name] = dict(entry, base=base, offset=offset, length=len(section))
+            sections.append(section)
+            offset += len(section)
+        current.close()
+        for name in updates:
+            (lang, files) = updates[name]
+            entry = lang.to_cache(files, alphabet)
+            section = json.dumps(entry.pop("grams")).encode("utf-8")
+            entry["base"] = len(entry.pop("alphabet"))
+            entries[name] = dict(entry, offset=offset, length=len(section))
+            sections.append(section)
+            offset += len(section)
+
+        toc = json.dumps({"alphabet": str(alphabet), "languages": entries}).encode("utf-8")
+        def write(file):
+            file.write("{} {} {}\n".format(MAGIC, VERSION, len(toc)).encode("ascii"))
+            file.write(toc)
+            for section in sections:
+                file.write(section)
+        atomic_write(self.filename, write)
@@ -3,13 +3,18 @@
     Written by Colin Hamilton, May 2016
 """
 import os
-import json
 from math import sqrt
 from ngramtrie import NGramTrie
+from alphabet import Alphabet
+import read_text
+
+# The version of the cache format written by Language.to_cache.  Caches of any
+#   other version, which may lack some of the header, are never up to date.
+CACHE_VERSION = 1
 
 
 def dot_product(lang1, lang2):
-    """Returns the sum over all trigrams of lang1 times lang2's frequency"""
+    """Returns the sum over all n-grams of lang1 times lang2's frequency"""
     sum = 0
     for key in lang1:
         if key in lang2:
@@ -39,11 +44,41 @@ class Language:
     a single space (' ') character.  Letters are converted to a standard case
     using str.casefold().  This is because, in general, and particularly for small
     documents, these features are not considered useful in distinguishing languages.
+
+    Alternatively, a Language can count byte n-grams, in which case files are
+    not decoded or transformed at all, and every byte is counted as it is.  This
+    is the fastest way to read a corpus, and works on mixed-encoding corpora.
+    Byte n-grams are read as latin-1 strings, so each character is one byte.
+
+    Internally, characters are numbered by an Alphabet, and n-grams are stored and
+    compared as packed integers (see alphabet.py); they are only turned back into
+    strings for display and generation.  Languages that will be compared often
+    should share an Alphabet, since comparing Languages with different alphabets
+    requires translating one into the other's alphabet first.
     """
 
-    def __init__(self, n=3):
-        """Initializes an NGramTrie with the given max size (defaults to 3)"""
+    def __init__(self, n=3, byte_grams=False, alphabet=None, encoding=None,
+                 errors="replace"):
+        """ Initializes an NGramTrie with the given max size (defaults to 3)
+
+        Args:
+            n:          The max size of n-grams to count
+            byte_grams: Whether to count byte n-grams instead of characters
+            alphabet:   The Alphabet to number characters with; by default
+                        the Language gets an Alphabet of its own
+            encoding:   The encoding to read files in, or None to guess it
+                        for each file
+            errors:     How to handle undecodable bytes when reading files
+                        (see read_text.read_text)
+        """
         self.n_grams = NGramTrie(n)
+        self.n_max = n
+        self.byte_grams = byte_grams
+        self.encoding = encoding
+        self.errors = errors
+        self.alphabet = Alphabet() if alphabet is None else alphabet
+        self._profiles = {}
+        self._norm = None
 
 # These functions handle transforming characters before counting them.
 #   They are intended to be overwritten and customized by subclassing
@@ -93,32 +128,117 @@ class Language:
         return " "
 
 
-    def add_file(self, filename):
+    def add_file(self, filename, encoding=None, errors=None):
         """ Analyses the given file, integrating it into the Language.
 
         Each character from the file is transformed with the transform() method.
         These characters are then compiled into n-grams, and counted accordingly.
+        If the Language counts byte n-grams, the encoding arguments are ignored.
         Args:
             filename: A string with the name of the document to analyse
+            encoding: The encoding of the document; by default the Language's
+            errors:   How to handle undecodable bytes; by default the Language's
+        """
+        if self.byte_grams:
+            self.add_bytes(read_text.read_blocks(filename))
+        else:
+            self.add_text(self._read_text(filename, encoding, errors))
+
+
+    def _read_text(self, filename, encoding, errors):
+        if encoding is None:
+            encoding = self.encoding
+        if errors is None:
+            errors = self.errors
+        return read_text.read_text(filename, encoding, errors)
+
+
+    def add_text(self, blocks):
+        """ Counts the n-grams of a document given as an iterable of strings.
+
+        The strings are treated as consecutive pieces of a single document, so
+        n-grams spanning two pieces are counted.
         """
         trie = self.n_grams
-        def _update(gram, char):
-            gram = gram + self.transform(char, gram)
-            gram = gram[-min(len(gram), trie.n_max):]
-            if len(gram) == trie.n_max:
-                trie.add(gram)
-            return gram
+        index = self.alphabet.index
+        for (offset, gram) in self.text_grams(blocks):
+            trie.add([index(char) for char in gram])
+        self._changed()
+
 
+    def add_bytes(self, blocks):
+        """Counts the byte n-grams of a document given as an iterable of bytes"""
+        trie = self.n_grams
+        index = self.alphabet.index
+        for (offset, gram) in self.raw_grams(blocks):
+            trie.add([index(char) for char in gram])
+        self._changed()
+
+
+    def text_grams(self, blocks):
+        """ Yields the n-grams of a document given as an iterable of strings.
+
+        These are exactly the n-grams add_text() counts, as strings of
+        transformed characters.
+        Yields:
+            Tuples of the form (offset, gram), where offset is the position in
+            the document of the character that completed the gram.  Grams
+            completed by first_gram() or last_gram() get the offset of the
+            first or last character of the document.
+        """
+        n = self.n_grams.n_max
         gram = ""
         for char in self.first_gram():
-            gram = _update(gram, char)
-        with open(filename, "r") as file:
-            for line in file:
-                for char in line:
-                    gram = _update(gram, char)
-            for char in self.last_gram():
-                gram = _update(gram, char)
-        self.n_grams = trie
+            gram = (gram + self.transform(char, gram))[-n:]
+            if len(gram) == n:
+                yield (0, gram)
+        offset = 0
+        for block in blocks:
+            for char in block:
+                gram = (gram + self.transform(char, gram))[-n:]
+                if len(gram) == n:
+                    yield (offset, gram)
+                offset += 1
+        last = max(offset - 1, 0)
+        for char in self.last_gram():
+            gram = (gram + self.transform(char, gram))[-n:]
+            if len(gram) == n:
+                yield (last, gram)
+
+
+    def raw_grams(self, blocks):
+        """ Yields the byte n-grams of a document given as an iterable of bytes.
+
+        As for text_grams(), but the grams are latin-1 strings, and offsets
+        are in bytes.
+        """
+        n = self.n_grams.n_max
+        carry = ""
+        offset = 0   # The position of the start of carry in the document
+        for block in blocks:
+            text = carry + block.decode("latin-1")
+            for start in range(len(text) - n + 1):
+                yield (offset + start + n - 1, text[start : start + n])
+            carry = text[len(text) - n + 1:]
+            offset += len(text) - len(carry)
+
+
+    def file_grams(self, filename, encoding=None, errors=None):
+        """ Yields the n-grams of a file, as add_file() would count them.
+
+        Yields:
+            Tuples of the form (offset, gram), as for text_grams() (or
+            raw_grams(), if the Language counts byte n-grams).
+        """
+        if self.byte_grams:
+            return self.raw_grams(read_text.read_blocks(filename))
+        return self.text_grams(self._read_text(filename, encoding, errors))
+
+
+    def _changed(self):
+        """Forgets anything computed from the counts, after they've changed"""
+        self._profiles = {}
+        self._norm = None
 
 
 
@@ -132,33 +252,106 @@ class Language:
                 if os.path.getmtime(file) > cache["files"][file]:
                     return False   # A more recent version is available
                 found[file] = True
-        if "n" not in cache:
+        if "n" not in cache or cache.get("version") != CACHE_VERSION:
+            return False
+        if cache.get("byte_grams", False) != self.byte_grams:
             return False
-        self.n_grams = NGramTrie(cache["n"])
-        if "grams" not in cache:
+        n = cache["n"]
+        self.n_grams = NGramTrie(n)
+        self.n_max = n
+        self._changed()
+        if "grams" not in cache or "alphabet" not in cache:
             return False
-        for gram in cache["grams"]:
-            self.n_grams.add(gram, count=cache["grams"][gram])
+        # The grams were packed in the cache's own alphabet
+        base = len(cache["alphabet"])
+        table = [self.alphabet.index(symbol) for symbol in cache["alphabet"]]
+        for (code, count) in cache["grams"]:
+            gram = [table[symbol] for symbol in self.alphabet.unpack(code, n, base)]
+            self.n_grams.add(gram, count=count)
         return True
 
 
-    def to_cache(self, files):
-        cache = {"files":{}, "n": self.n_grams.n_max, "grams": {}}
+    def to_cache(self, files, alphabet=None):
+        """ Returns a dict of the Language's counts, suitable for JSON.
+
+        Besides the counts themselves, this holds the modification times of the
+        files they came from, and the norm and total count of the n-grams, so
+        that a CachedLanguage can be compared without counting anything.
+        Args:
+            files:    The names of the files the Language was made from
+            alphabet: The Alphabet to pack the grams in, by default the
+                Language's own.  Any characters missing from it are added.
+        """
+        n = self.n_grams.n_max
+        table = None
+        if alphabet is None:
+            alphabet = self.alphabet
+        elif alphabet is not self.alphabet:
+            table = [alphabet.index(symbol) for symbol in self.alphabet.symbols]
+        cache = {"version": CACHE_VERSION, "files":{}, "n": n, "grams": [],
+                 "byte_grams": self.byte_grams, "encoding": self.encoding,
+                 "errors": self.errors, "alphabet": str(alphabet),
+                 "norm": self.norm(), "total": self.n_grams.counts[n]}
         for file in files:
             cache["files"][file] = os.path.getmtime(file)
-        cache["grams"] = self.n_grams.gram_counts()
+        # A list of pairs, since JSON object keys must be strings
+        grams = self.n_grams.gram_counts(len(alphabet), table=table)
+        cache["grams"] = list(grams.items())
         return cache
 
 
     def __str__(self):
         """A string representation of sorted n-gram frequencies of the Language"""
         string = ""
-        grams = self.n_grams.frequencies()
-        for (gram, freq) in sorted(grams.items(), key=lambda x: x[1]):
-            string += "'" + gram + "'  " + str(freq) + "\n"
+        n = self.n_max
+        for (code, freq) in sorted(self.profile().items(), key=lambda x: x[1]):
+            string += "'" + self.alphabet.decode(code, n) + "'  " + str(freq) + "\n"
         return string[:-1]
 
 
+    def profile(self, alphabet=None):
+        """ Returns the frequencies of the Language's n-grams.
+
+        Args:
+            alphabet: The Alphabet to pack the n-grams in; by default the
+                Language's own.  n-grams with characters not in the given
+                Alphabet are left out.
+        Returns:
+            A dictionary mapping packed n-grams to frequencies.  It should not
+            be modified, as it may be returned again.
+        """
+        if alphabet is None:
+            alphabet = self.alphabet
+        def compute():
+            table = None
+            if alphabet is not self.alphabet:
+                table = self.alphabet.translation(alphabet)
+            return self.n_grams.frequencies(len(alphabet), table=table)
+        return alphabet.cached(self._profiles, alphabet, compute)
+
+
+    def counts(self, alphabet=None):
+        """ Returns the counts of the Language's n-grams.
+
+        Args:
+            alphabet: The Alphabet to pack the n-grams in, as for profile()
+        Returns:
+            A dictionary mapping packed n-grams to the number of times they
+            were counted.
+        """
+        if alphabet is None or alphabet is self.alphabet:
+            return self.n_grams.gram_counts(len(self.alphabet))
+        table = self.alphabet.translation(alphabet)
+        return self.n_grams.gram_counts(len(alphabet), table=table)
+
+
+    def norm(self):
+        """Returns the norm of the Language's n-gram frequencies"""
+        if self._norm is None:
+            self._norm = norm(self.profile())
+        return self._norm
+
+
     def compare(self, other):
         """Compares self to other.
 
@@ -170,9 +363,9 @@ class Language:
             means virtually unrelated.  For n=3, two objects of the same language
             will typically have a correlation between 0.8 and 0.95
         """
-        lang1 = self.n_grams.frequencies()
-        lang2 = other.n_grams.frequencies()
-        denom = norm(lang1) * norm(lang2)
+        lang1 = self.profile(other.alphabet)
+        lang2 = other.profile()
+        denom = self.norm() * other.norm()
         if denom == 0:
             return 0
         else:
@@ -180,7 +373,117 @@ class Language:
 
 
     def predict_next_char(self, start, random=True):
+        """Returns a character to follow the string start, or "" if none can be found"""
+        gram = [self.alphabet.get(char) for char in start]
         if random:
-            return self.n_grams.next_random(start)
+            symbol = self.n_grams.next_random(gram)
+        else:
+            symbol = self.n_grams.next_most_likely(gram)
+        return "" if symbol is None else self.alphabet.symbols[symbol]
+
+
+
+class CachedLanguage(Language):
+    """ A Language whose counts are loaded from a cache only once they're needed.
+
+    A CachedLanguage is created from the header of a cache (see to_cache; the
+    header is everything but the grams), plus a function to call to load the
+    grams themselves.  Comparisons only need the cached norm and the n-gram
+    frequencies, so the trie is only built if something else needs it, such
+    as character prediction (or adding more files).
+    """
+
+    def __init__(self, header, load_grams, alphabet=None):
+        """ Creates a Language from the header of a cache.
+
+        Args:
+            header:     The dict from to_cache, without the "grams" key
+            load_grams: A function with no arguments that returns the list of
+                        (packed n-gram, count) pairs of the cache
+            alphabet:   The Alphabet to number characters with
+        """
+        Language.__init__(self, header["n"], header.get("byte_grams", False), alphabet,
+                          header.get("encoding"), header.get("errors", "replace"))
+        self.header = header
+        self._load_grams = load_grams
+        self._grams = None
+        self._trie = None
+        # Number the cache's characters now, so grams can be translated later
+        self._table = [self.alphabet.index(symbol) for symbol in header["alphabet"]]
+
+
+    @property
+    def n_grams(self):
+        """The NGramTrie of the Language, built from the cache on first use"""
+        if self._trie is None:
+            cache = {key: self.header[key] for key in self.header if key != "files"}
+            cache["grams"] = self.grams()
+            self.read_cache(cache)
+        return self._trie
+
+    @n_grams.setter
+    def n_grams(self, trie):
+        self._trie = trie
+
+
+    def grams(self):
+        """Returns the cached list of (packed n-gram, count) pairs, loading it if needed"""
+        if self._grams is None:
+            self._grams = self._load_grams()
+        return self._grams
+
+
+    def profile(self, alphabet=None):
+        """ Returns the frequencies of the Language's n-grams, as Language.profile
+
+        Unless the trie has already been built, the frequencies are computed
+        straight from the cached counts.
+        """
+        if self._trie is not None:
+            return Language.profile(self, alphabet)
+        if alphabet is None:
+            alphabet = self.alphabet
+        return alphabet.cached(self._profiles, alphabet,
+                               lambda: self._cached_profile(alphabet))
+
+
+    def _cached_profile(self, alphabet):
+        """Computes the n-gram frequencies from the cached counts"""
+        total = self.header["total"]
+        if total == 0:
+            return {}
+        return {code: count / total for (code, count) in self.counts(alphabet).items()}
+
+
+    def counts(self, alphabet=None):
+        """ Returns the counts of the Language's n-grams, as Language.counts
+
+        Unless the trie has already been built, the counts are taken straight
+        from the cache.
+        """
+        if self._trie is not None:
+            return Language.counts(self, alphabet)
+        if alphabet is None:
+            alphabet = self.alphabet
+        header_base = len(self.header["alphabet"])
+        if alphabet is self.alphabet:
+            table = self._table
         else:
-            return self.n_grams.next_most_likely(start)
+            table = [alphabet.get(self.alphabet.symbols[index]) for index in self._table]
+        if len(alphabet) == header_base and table == list(range(header_base)):
+            # The grams were packed in the same alphabet; nothing to translate
+            return dict(self.grams())
+        n = self.header["n"]
+        counts = {}
+        for (code, count) in self.grams():
+            gram = [table[symbol] for symbol in alphabet.unpack(code, n, header_base)]
+            if None not in gram:
+                counts[alphabet.pack(gram)] = count
+        return counts
+
+
+    def norm(self):
+        """Returns the cached norm of the Language's n-gram frequencies"""
+        if self._trie is not None:
+            return Language.norm(self)
+        return self.header["norm"]
@@ -2,61 +2,132 @@
 
     Written by Colin Hamilton, May 2016
 """
-import json
-from language import Language
+import os
+from math import sqrt
+from language import Language, CachedLanguage, CACHE_VERSION
+from alphabet import Alphabet
+import scoring
 
-def match(unknown, known):
+DEFAULT_BUNDLE = ".ngrams.bundle"
+
+def match(unknown, known, scorer=None):
     """ Compares the unknown language with all known languages.
 
     Args:
         unknown:  A Language object to be compared.
         known:    A dict mapping language names to Language objects.
+        scorer:   The scoring.Scorer to compare with; by default, cosine
+                  similarity (as in Language.compare).  The same scorer
+                  should be reused for every document, as it keeps what it
+                  prepares for each known language.
     Returns:
         A list of tuples of the form (language_name, score), sorted from
         best to worst matches.
     """
-    results = [(name, unknown.compare(known[name])) for name in known]
-    return sorted(results, key=lambda x: -x[1])
+    if scorer is None:
+        scorer = scoring.CosineScorer()
+    document = scorer.document(unknown)
+    results = [(name, scorer.score(document, known[name])) for name in known]
+    return sorted(scorer.finish(results), key=lambda x: -x[1])
+
+
+def cache_up_to_date(header, files, n_max, byte_grams=False, encoding=None,
+                     errors="replace"):
+    """ Checks whether a cache holds the current counts for a language.
+
+    Args:
+        header: The header of the cache (see Language.to_cache)
+        files:  The list of filenames the language should be made of
+        n_max, byte_grams: The kind of n-grams the language should count
+        encoding, errors:  How the files should have been decoded (ignored
+                for byte n-grams, which aren't decoded)
+    Returns:
+        True if the cache is of the current format, counts the same kind of
+        n-grams, decoded the same way, from exactly the given files, and none
+        of them has been modified since.
+    """
+    if header.get("version") != CACHE_VERSION:
+        return False   # Older caches may lack parts of the header
+    if header.get("n") != n_max or header.get("byte_grams", False) != byte_grams:
+        return False
+    if not byte_grams and (header.get("encoding") != encoding or
+                           header.get("errors") != errors):
+        return False
+    cached_files = header.get("files", {})
+    if set(cached_files) != set(files):
+        return False   # A file has been added or removed
+    for file in cached_files:
+        if os.path.getmtime(file) > cached_files[file]:
+            return False   # A more recent version is available
+    return True
 
 
-def read_languages(file_dict, n_max, cachefiles={}):
+def read_languages(file_dict, n_max, data=DEFAULT_BUNDLE, encoding=None,
+                   errors="replace", byte_grams=False):
     """ Creates a set of Language objects with the given languages and files.
     Args:
         file_dict: A dict mapping language names to a list of filenames
         n_max:     The maximum length n-grams for the Languages to track
+        data:      The name of the model bundle file to use as a cache
+        encoding:  The encoding of the files, or None to guess for each file
+        errors:    How to handle undecodable bytes (see read_text.read_text)
+        byte_grams: Whether to count byte n-grams instead of character n-grams
     Returns:
         A dict mapping language names to Language objects populated with the
-        contents of the files specified.
+        contents of the files specified.  The Languages share an Alphabet.
+        Languages that are up to date in the bundle are CachedLanguages,
+        which only load their counts once they are used.
     Notes:
         If a file cannot be read, an error message will be printed, and an
-        exception will not be thrown.
+        exception will not be thrown.  Any languages that were not up to date
+        are saved to the bundle together, once all have been read; if data
+        names a file that is not a bundle, nothing is read from or saved to it.
     """
+    from bundle import ModelBundle   # Not needed (nor json) just to match
+    save = True
+    try:
+        bundle = ModelBundle(data)
+    except ValueError:
+        # Never overwrite a file that isn't a bundle; just run without one
+        print("Could not read model bundle", data, "- not using a cache")
+        bundle = ModelBundle(data, read=False)
+        save = False
+    # Absolute names, so the bundle can be shared by runs from any directory
+    file_dict = {lang: [os.path.abspath(file) for file in file_dict[lang]]
+                 for lang in file_dict}
+    # Check all languages before loading anything
+    up_to_date = set()
+    for lang in file_dict:
+        if (lang in bundle.languages and
+                cache_up_to_date(bundle.languages[lang], file_dict[lang],
+                                 n_max, byte_grams, encoding, errors)):
+            up_to_date.add(lang)
+
     results = {}
+    updates = {}
+    alphabet = Alphabet(bundle.alphabet)
     for lang in file_dict:
-        results[lang] = Language(n_max)
-        cachefile = ".{}.ngramcache".format(lang)
-        try:
-            with open(cachefile, "r") as cache:
-                if (results[lang].read_cache(json.load(cache),
-                                        expected=file_dict[lang])):
-                    print("Cache up to date for {}".format(lang))
-                    continue  # success
-        except Exception:
-            pass
-        results[lang] = Language(n_max)  # Overwrite any old results
+        if lang in up_to_date:
+            results[lang] = CachedLanguage(bundle.header(lang), bundle.loader(lang), alphabet)
+            print("Cache up to date for {}".format(lang))
+            continue
+        results[lang] = Language(n_max, byte_grams, alphabet, encoding, errors)
         print("Cache not up to date for {}".format(lang))
-        # if cache does not exist, is not up to date, or is corrupted
+        read = []   # Only these are recorded, so the others are retried next time
         for filename in file_dict[lang]:
             try:
                 results[lang].add_file(filename)
+                read.append(filename)
             except Exception:
                 print("Could not read file", filename)
-        with open(cachefile, "w") as cachefile:
-            cachefile.write(json.dumps(results[lang].to_cache(file_dict[lang])))
+        updates[lang] = (results[lang], read)
+    if updates and save:
+        bundle.save(updates)
     return results
 
 
-def best_matches(filename, reference_langs, n_max, amt=None):
+def best_matches(filename, reference_langs, n_max, amt=None, encoding=None,
+                 errors="replace", byte_grams=False, scorer=None):
     """ Finds the closest matches for a document from among a set of Languages.
 
     Args:
@@ -64,13 +135,127 @@ def best_matches(filename, reference_langs, n_max, amt=None):
         reference_langs: A dict mapping language names to Language objects.
         n_max:    The length of n-grams to classify the unknown document on.
         amt:      The number of results to return (or None, to return all)
+        encoding, errors, byte_grams:  How to read the document, as for
+                  read_languages
+        scorer:   The scoring.Scorer to compare with, as for match
     Returns:
         A list of tuples of the form (language_name, score), sorted from
         best to worst matches.  Only the top amt are in the list.
     """
     if amt is None:
         amt = len(reference_langs)
-    unknown = Language(n_max)
+    unknown = Language(n_max, byte_grams, encoding=encoding, errors=errors)
     unknown.add_file(filename)
-    comparisons = match(unknown, reference_langs)
+    comparisons = match(unknown, reference_langs, scorer)
     return comparisons[: min(amt, len(comparisons))]
+
+
+def segment_grams(grams, reference_langs, window):
+    """ Splits a stream of n-grams into spans, each labelled with its best match.
+
+    A window of n-grams slides over the stream, and is compared to each
+    reference language by cosine similarity.  As each n-gram enters or leaves
+    the window, the window's dot product with every language and its own norm
+    are updated in place, so each step takes time proportional to the number
+    of languages, not to the size of the window.  Each n-gram is labelled with
+    the best match of the window centred on it, and runs of the same label
+    form the spans.
+    Args:
+        grams:  An iterable of (offset, gram) tuples, as from Language.file_grams
+        reference_langs: A dict mapping language names to Language objects.
+                They should share an Alphabet, which the grams are packed in.
+        window: The number of n-grams in the window
+    Returns:
+        A list of tuples of the form (start, end, language_name, score),
+        where start and end are offsets in the document, and score is the
+        average score of the language over the span.  The spans cover the
+        document without overlapping.
+    """
+    names = list(reference_langs)
+    if not names:
+        return []
+    alphabet = reference_langs[names[0]].alphabet
+    # For each packed n-gram, the frequencies in each language, scaled by norms
+    weights = {}
+    for (index, name) in enumerate(names):
+        lang = reference_langs[name]
+        lang_norm = lang.norm()
+        if lang_norm == 0:
+            continue
+        for (code, freq) in lang.profile(alphabet).items():
+            weights.setdefault(code, []).append((index, freq / lang_norm))
+
+    def _key(gram):
+        symbols = [alphabet.get(char) for char in gram]
+        if None in symbols:
+            return gram   # Can't match any language, but still counts to the norm
+        return alphabet.pack(symbols)
+
+    offsets = []
+    keys = []
+    for (offset, gram) in grams:
+        offsets.append(offset)
+        keys.append(_key(gram))
+    if not keys:
+        return []
+    window = max(1, min(window, len(keys)))
+
+    counts = {}
+    dots = [0] * len(names)
+    norm_squared = 0
+    labels = []   # The best (index, score) of each full window
+    for (position, key) in enumerate(keys):
+        count = counts.get(key, 0)
+        counts[key] = count + 1
+        norm_squared += 2 * count + 1
+        for (index, weight) in weights.get(key, ()):
+            dots[index] += weight
+        if position >= window:
+            old = keys[position - window]
+            count = counts[old] - 1
+            counts[old] = count
+            norm_squared -= 2 * count + 1
+            for (index, weight) in weights.get(old, ()):
+                dots[index] -= weight
+        if position >= window - 1:
+            scale = sqrt(norm_squared)
+            best = max(range(len(names)), key=lambda index: dots[index])
+            labels.append((best, dots[best] / scale if scale else 0))
+
+    # Window i covers grams i to i + window - 1; label each gram by the
+    #   window centred on it, or the nearest window at either end
+    half = window // 2
+    spans = []
+    for position in range(len(keys)):
+        (best, score) = labels[max(0, min(position - half, len(labels) - 1))]
+        if spans and spans[-1][2] == best:
+            spans[-1][3] += score
+            spans[-1][4] += 1
+        else:
+            start = offsets[position] if spans else 0
+            if spans:
+                spans[-1][1] = start
+            spans.append([start, None, best, score, 1])
+    spans[-1][1] = offsets[-1] + 1
+    return [(start, end, names[best], total / amount)
+            for (start, end, best, total, amount) in spans]
+
+
+def segment(filename, reference_langs, n_max, window, encoding=None,
+            errors="replace", byte_grams=False):
+    """ Splits a document into spans of the languages they best match.
+
+    Args:
+        filename: The name of the file of the document to segment.
+        reference_langs: A dict mapping language names to Language objects.
+        n_max:    The length of n-grams to segment the document on.
+        window:   The number of n-grams to compare at a time
+        encoding, errors, byte_grams:  How to read the document, as for
+                  read_languages
+    Returns:
+        A list of (start, end, language_name, score) tuples, as for
+        segment_grams.
+    """
+    unknown = Language(n_max, byte_grams, encoding=encoding, errors=errors)
+    grams = unknown.file_grams(filename)
+    return segment_grams(grams, reference_langs, window)
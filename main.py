@@ -22,14 +22,33 @@
     - Add option for directory traversal
 """
 import sys
+import codecs
 import argparse
 import read_files
 import language_match
+import scoring
 
 
 DESCRIPTION = ("Compares documents written in unknown languages to known languages.")
 
 
+def encoding_name(string):
+    """Checks that an argument names an encoding Python knows"""
+    try:
+        codecs.lookup(string)
+    except LookupError:
+        raise argparse.ArgumentTypeError("unknown encoding {!r}".format(string))
+    return string
+
+
+def positive_int(string):
+    """Converts an argument to an int, rejecting anything less than 1"""
+    value = int(string)
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, not {}".format(value))
+    return value
+
+
 parser = argparse.ArgumentParser(description=DESCRIPTION,
                     formatter_class=argparse.RawDescriptionHelpFormatter)
 parser.add_argument("--n-gram-max", "-n", metavar="N", type=int,
@@ -44,13 +63,32 @@ parser.add_argument("--matches", "-m", type=int,
 parser.add_argument("--unknown", "-u",
                     help="the keyword designating unknown languages in input file " +
                         "(default '%(default)s')")
-parser.add_argument("--data", "-d", default=None,  # Just a flag?  Make hidden files for langs?
-                    help="file to use as cache for languages") #read and write to
+parser.add_argument("--data", "-d",
+                    help="model bundle file to use as a cache for all languages " +
+                        "(default '%(default)s')")
+parser.add_argument("--encoding", "-e", type=encoding_name,
+                    help="encoding of all files read (by default, guessed for each file)")
+parser.add_argument("--errors", choices=["strict", "replace", "ignore"],
+                    help="how to handle bytes that cannot be decoded " +
+                        "(default '%(default)s')")
+parser.add_argument("--bytes", "-b", action="store_true", dest="byte_grams",
+                    help="count byte n-grams, skipping decoding entirely")
+parser.add_argument("--metric", choices=sorted(scoring.SCORERS),
+                    help="how to score matches: cosine similarity, out-of-place " +
+                        "rank distance, or naive Bayes (default '%(default)s')")
+parser.add_argument("--segment", "-S", metavar="WINDOW", type=positive_int,
+                    help="split documents into spans of different languages, comparing " +
+                        "WINDOW n-grams at a time (always by cosine similarity)")
+parser.add_argument("--save-snapshot", metavar="FILE",
+                    help="also save the known languages to a snapshot, for quick.py")
 parser.add_argument("--traverse", "-t", nargs="?", const="./",
                     help="add languages found in directory traversal")
 
 parser.set_defaults(n_gram_max=3,
                     unknown="Unknown",
+                    errors="replace",
+                    metric="cosine",
+                    data=language_match.DEFAULT_BUNDLE,
                     matches=5)
 
 
@@ -84,14 +122,17 @@ def find_langs(args):
 
 
 
-def report_matches(unknown, reference_langs, args):
+def report_matches(unknown, reference_langs, args, scorer):
     """ Matches an unknown document against known languages, prints results
 
     Args:
         unknown: The name of a file to classify
         reference_langs: A dict mapping language names to Language objects
+        scorer:  The scoring.Scorer to compare with
     """
-    matches = language_match.best_matches(unknown, reference_langs, args.n_gram_max, args.matches)
+    matches = language_match.best_matches(unknown, reference_langs, args.n_gram_max, args.matches,
+                                          args.encoding, args.errors, args.byte_grams,
+                                          scorer)
     print("Best match{} for".format("es" if args.matches != 1 else ""), repr(unknown))
     pad = max([len(name) for (name, score) in matches])
     for (name, score) in matches:
@@ -99,13 +140,44 @@ def report_matches(unknown, reference_langs, args):
 
 
 
+def report_segments(unknown, reference_langs, args):
+    """ Splits an unknown document into spans of known languages, prints results
+
+    Args:
+        unknown: The name of a file to segment
+        reference_langs: A dict mapping language names to Language objects
+    """
+    spans = language_match.segment(unknown, reference_langs, args.n_gram_max, args.segment,
+                                   args.encoding, args.errors, args.byte_grams)
+    print("Segments of", repr(unknown))
+    if not spans:
+        return
+    width = len(str(spans[-1][1]))
+    pad = max([len(name) for (start, end, name, score) in spans])
+    for (start, end, name, score) in spans:
+        print("\t", str(start).rjust(width), "-", str(end).ljust(width), "\t",
+              name.ljust(pad), "\t{:>6.2%}".format(score))
+
+
+
 def main(args):
     """Runs the program after args have been processed"""
     reference_langs = find_langs(args) # or from cache
     unknowns = reference_langs.pop(args.unknown, [])
-    reference_langs = language_match.read_languages(reference_langs, args.n_gram_max)
+    reference_langs = language_match.read_languages(reference_langs, args.n_gram_max,
+                                                    data=args.data,
+                                                    encoding=args.encoding,
+                                                    errors=args.errors,
+                                                    byte_grams=args.byte_grams)
+    if args.save_snapshot:
+        import snapshot
+        snapshot.save_snapshot(args.save_snapshot, reference_langs)
+    scorer = scoring.SCORERS[args.metric]()
     for unknown in unknowns:
-        report_matches(unknown, reference_langs, args)
+        if args.segment is not None:
+            report_segments(unknown, reference_langs, args)
+        else:
+            report_matches(unknown, reference_langs, args, scorer)
 
 
 if __name__ == "__main__":
@@ -7,43 +7,47 @@
             You can just add more count integers if longer grams are put in.
 """
 
-import random
-
 # For the recursive functions, a recursive representation of a trie
 #   is defined as follows:  a trie is an object with "count" and "next"
 #   keys.  The former is the total number of n-grams counted in the trie.
-#   The latter is a dict whose keys are characters and whose values
+#   The latter is a dict whose keys are symbols and whose values
 #   are tries.
-
-def _trie_at(string, trie):
-    """Goes into the trie, returns sub-trie at the given string, or None"""
-    if len(string) <= 0:
+#
+# Symbols are the integer indices of characters in an Alphabet, so a gram is
+#   a sequence of integers.  Whole grams are reported as single integers,
+#   packed in a given base (see alphabet.py).
+
+def _trie_at(gram, trie):
+    """Goes into the trie, returns sub-trie at the given gram, or None"""
+    if len(gram) <= 0:
         return trie
-    if string[0] not in trie["next"]:
-        #print(string[0], trie)
+    if gram[0] not in trie["next"]:
         return None
-    return _trie_at(string[1:], trie["next"][string[0]])
+    return _trie_at(gram[1:], trie["next"][gram[0]])
 
 
-def _add_ngram_recursive(ngram, trie, count=1):
+def _add_ngram(ngram, trie, count=1):
     """Adds ngram to trie count times"""
-    if len(ngram) <= 0: return
-    if ngram[0] not in trie:
-        trie[ngram[0]] = {"count": 0, "next": {}}
-    trie[ngram[0]]["count"] += count
-    _add_ngram_recursive(ngram[1:], trie[ngram[0]]["next"], count)
+    for symbol in ngram:
+        node = trie.get(symbol)
+        if node is None:
+            node = trie[symbol] = {"count": 0, "next": {}}
+        node["count"] += count
+        trie = node["next"]
 
 
 def _trie_to_str_recursive(trie, gram_so_far):
     """prints a tree representation of a trie; largely for debugging"""
     string = ""
-    for char in trie:
-        string += '"' + gram_so_far + char + '" : ' + str(trie[char]["count"]) + "\n"
-        string += _trie_to_str_recursive(trie[char]["next"], gram_so_far + char)
+    for symbol in trie:
+        gram = gram_so_far + (symbol,)
+        string += str(gram) + " : " + str(trie[symbol]["count"]) + "\n"
+        string += _trie_to_str_recursive(trie[symbol]["next"], gram)
     return string
 
 
 def weighted_random(probabilities):
+    import random   # Only needed for generation, so not imported up front
     if sum(probabilities.values()) <= 0:    # If all are zero, make all equally likely
         new_probs = {}
         for key in probabilities:
@@ -66,6 +70,9 @@ class NGramTrie:
     to keep track of.  Once filled, n-gram counts of this size or less can be
     retrieved.  Note the size of an NGramTrie increases roughly exponentially in
     the size of the maximum n.  A max n of no more than 7-9 is recommended.
+
+    Grams are sequences of integer symbols; an NGramTrie does not know which
+    characters they stand for.
     """
 
     def __init__(self, n):
@@ -84,17 +91,17 @@ class NGramTrie:
         self.root["count"] += count
         for index in range(len(ngram) + 1):
             self.counts[index] += count
-        _add_ngram_recursive(ngram, self.root["next"], count)
+        _add_ngram(ngram, self.root["next"], count)
 
 
     def add(self, gram, count=1):
-        """Adds a string to the trie the specified number of times.
+        """Adds a gram to the trie the specified number of times.
 
-        If the string is too long, it will be broken into all possible n-grams,
+        If the gram is too long, it will be broken into all possible n-grams,
             where n is the n-max of this NGramTrie.
 
         Args:
-            gram: The string consisting of the n-gram(s) to add
+            gram: The sequence of symbols consisting of the n-gram(s) to add
             count: The number of times to add the n-gram
         TODO:
             Don't do this breaking up stuff; just increase n_max
@@ -102,73 +109,104 @@ class NGramTrie:
         if len(gram) <= self.n_max:
             self._add_proper_length_gram(gram, count)
             return
-        # divide up the string into all ngrams
+        # divide up the gram into all ngrams
         for start in range(len(gram) - self.n_max + 1):
             self._add_proper_length_gram(gram[start : start + self.n_max], count)
 
 
-    def _frequencies_recursive(self, trie, depth, goal, gram_so_far):
-        """returns a list of (string, frequency) tuples from the specified depth"""
+    def _frequencies_recursive(self, trie, depth, goal, gram_so_far, base, table):
+        """returns a list of (code, frequency) tuples from the specified depth"""
         if depth == goal:
             return [(gram_so_far, trie["count"] / self.counts[depth])]
         list = []
-        for char in trie["next"]:
-            list += self._frequencies_recursive(trie["next"][char], depth+1,
-                                                goal, gram_so_far + char)
+        for symbol in trie["next"]:
+            if table is not None:
+                if table[symbol] is None:
+                    continue
+                code = gram_so_far * base + table[symbol]
+            else:
+                code = gram_so_far * base + symbol
+            list += self._frequencies_recursive(trie["next"][symbol], depth+1,
+                                                goal, code, base, table)
         return list
 
 
-    def frequencies(self, depth=-1):
-        """returns a dictionary mapping n-grams to frequencies.
+    def frequencies(self, base, depth=-1, table=None):
+        """returns a dictionary mapping packed n-grams to frequencies.
 
         Args:
+            base:  the base to pack n-grams in, normally the size of the alphabet
             depth: the length of n-grams to query, should be between 0 and n_max
                 (otherwise will be set to n_max)
+            table: optionally, a list mapping each symbol to the symbol to
+                pack instead (for packing in another alphabet).  Any n-gram
+                with a symbol mapped to None is left out.
         Returns:
-            A dictionary whose keys are the n-grams of the specified length,
-                mapped to their frequencies (a number between 0 and 1)
+            A dictionary whose keys are the packed n-grams of the specified
+                length, mapped to their frequencies (a number between 0 and 1)
         """
         if depth > self.n_max or depth < 0:
             depth = self.n_max
-        return dict(self._frequencies_recursive(self.root, 0, depth, ""))
+        base = max(base, 1)
+        return dict(self._frequencies_recursive(self.root, 0, depth, 0, base, table))
 
 
-    def _counts_recursive(self, trie, depth_goal, gram_so_far):
-        """returns a list of (string, count) tuples from the specified depth"""
+    def _counts_recursive(self, trie, depth_goal, gram_so_far, base, table):
+        """returns a list of (code, count) tuples from the specified depth"""
         if depth_goal <= 0:
             return [(gram_so_far, trie["count"])]
         list = []
-        for char in trie["next"]:
-            list += self._counts_recursive(trie["next"][char], depth_goal - 1,
-                                            gram_so_far + char)
+        for symbol in trie["next"]:
+            if table is not None:
+                if table[symbol] is None:
+                    continue
+                code = gram_so_far * base + table[symbol]
+            else:
+                code = gram_so_far * base + symbol
+            list += self._counts_recursive(trie["next"][symbol], depth_goal - 1,
+                                            code, base, table)
         return list
 
 
-    def gram_counts(self, depth=-1):
+    def gram_counts(self, base, depth=-1, table=None):
+        """returns a dictionary mapping packed n-grams to their counts.
+
+        The arguments are as for frequencies().
+        """
         if depth > self.n_max or depth < 0:
             depth = self.n_max
-        return dict(self._counts_recursive(self.root, depth, ""))
+        return dict(self._counts_recursive(self.root, depth, 0, max(base, 1), table))
 
 
 
     def __str__(self):
-        """Represents a trie as a dict"""
-        return str(self.frequencies(self.n_max))
+        """Represents a trie as a dict of its n-grams, as tuples of symbols"""
+        return str(dict(self._counts_tuples(self.root, self.n_max, ())))
+
+    def _counts_tuples(self, trie, depth_goal, gram_so_far):
+        if depth_goal <= 0:
+            return [(gram_so_far, trie["count"])]
+        list = []
+        for symbol in trie["next"]:
+            list += self._counts_tuples(trie["next"][symbol], depth_goal - 1,
+                                        gram_so_far + (symbol,))
+        return list
 
     def __repr__(self):
         """A tree-like representation of the trie, with its counts"""
-        return _trie_to_str_recursive(self.root["next"], "")[:-1]
+        return _trie_to_str_recursive(self.root["next"], ())[:-1]
 
 
 
-    def next_most_likely(self, string):
+    def next_most_likely(self, gram):
+        """Returns a symbol likely to follow the gram, or None"""
         trie = None
-        num_chars = min(len(string), self.n_max - 1)
+        num_chars = min(len(gram), self.n_max - 1)
         while trie is None and num_chars >= 0:
-            trie = _trie_at(string[-num_chars:], self.root)
+            trie = _trie_at(gram[len(gram) - num_chars:], self.root)
             num_chars -= 1
         if trie is None:  # No prediction can be made
-            return ""
+            return None
         probabilities = {}
         for key in trie["next"]:
             if trie["next"][key] is None:
@@ -178,15 +216,15 @@ class NGramTrie:
         return weighted_random(probabilities)
 
 
-    def next_random(self, string):
+    def next_random(self, gram):
+        """Returns a random symbol to follow the gram, weighted by counts, or None"""
         trie = None
-        num_chars = min(len(string), self.n_max - 1)
+        num_chars = min(len(gram), self.n_max - 1)
         while (not trie or not trie["next"]) and num_chars >= 0:
-            substr = "" if num_chars == 0 else string[-num_chars:]
-            trie = _trie_at(substr, self.root)
+            trie = _trie_at(gram[len(gram) - num_chars:], self.root)
             num_chars -= 1
         if not trie or not trie["next"]:  # No prediction can be made
-            return ""
+            return None
         probabilities = {}
         for key in trie["next"]:
             if trie["next"][key] is None:
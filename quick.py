@@ -0,0 +1,54 @@
+""" A fast-starting program for classifying short strings
+
+    Usage:
+        python quick.py SNAPSHOT [TEXT ...]
+
+    Prints the best matching language, and its score, for each TEXT (or for
+    each line of standard input, if no TEXT is given), using the languages in
+    SNAPSHOT.  A snapshot is written by main.py with the --save-snapshot option.
+
+    This skips everything main.py does before classifying: there is no option
+    parsing, no source file, no cache validation, and only the modules that
+    are needed are imported, once they are needed.
+"""
+import sys
+
+USAGE = "usage: python quick.py SNAPSHOT [TEXT ...]"
+
+
+def classify(text, reference_langs):
+    """Returns the (language_name, score) tuple of the best match for a string"""
+    from language import Language
+    import language_match
+    any_lang = next(iter(reference_langs.values()))
+    unknown = Language(any_lang.n_max, any_lang.byte_grams)
+    if unknown.byte_grams:
+        unknown.add_bytes([text.encode("utf-8")])
+    else:
+        unknown.add_text([text])
+    return language_match.match(unknown, reference_langs)[0]
+
+
+def main(argv):
+    """Runs the program with the given command line arguments; returns an exit status"""
+    if not argv or argv[0] in ("-h", "--help"):
+        print(USAGE)
+        return 0 if argv else 2
+    import snapshot
+    try:
+        reference_langs = snapshot.read_snapshot(argv[0])
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    if not reference_langs:
+        print("No languages in", argv[0], file=sys.stderr)
+        return 1
+    texts = argv[1:] or (line.rstrip("\n") for line in sys.stdin)
+    for text in texts:
+        (name, score) = classify(text, reference_langs)
+        print(name, "{:.2%}".format(score), sep="\t")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
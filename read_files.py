@@ -1,8 +1,9 @@
 
 import os
 import os.path
-import glob
-import braceexpand
+
+# If a name has none of these, it needs no expanding
+_SPECIAL_CHARS = set("{}*?[]~$\\")
 
 def expand_file_expression(name):
     """ Expands Unix-style wildcards in nearly the same way the shell would
@@ -16,6 +17,11 @@ def expand_file_expression(name):
         All names represent existing files (though could potentially be
         broken symlinks).
     """
+    if _SPECIAL_CHARS.isdisjoint(name):
+        # Saves importing glob and braceexpand (which compiles regexes)
+        return [name] if os.path.lexists(name) else []
+    import glob
+    import braceexpand
     try:
         names = braceexpand.braceexpand(name)
     except braceexpand.UnbalancedBracesError:
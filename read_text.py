@@ -0,0 +1,118 @@
+""" Functions for reading the contents of documents in large blocks.
+
+    Files are read as binary blocks and decoded incrementally, so a multi-byte
+    character split across two blocks is still decoded correctly, and a bad
+    byte only affects the character it belongs to rather than the whole file.
+"""
+import codecs
+
+BLOCK_SIZE = 1 << 16
+
+# Used when a document has no byte order mark and is not valid UTF-8 (see
+#   read_text).  Every byte is a valid latin-1 character, so decoding with it
+#   can never fail.
+FALLBACK_ENCODING = "latin-1"
+
+# UTF-32 must be checked before UTF-16, as the little-endian UTF-32 mark
+#   starts with the little-endian UTF-16 mark.
+_BOMS = [(codecs.BOM_UTF32_LE, "utf-32"),
+         (codecs.BOM_UTF32_BE, "utf-32"),
+         (codecs.BOM_UTF8, "utf-8-sig"),
+         (codecs.BOM_UTF16_LE, "utf-16"),
+         (codecs.BOM_UTF16_BE, "utf-16")]
+
+
+def sniff_encoding(block):
+    """ Finds the encoding given by a byte order mark at the start of a document.
+
+    Args:
+        block: A bytes object read from the start of the document
+    Returns:
+        The name of the encoding the byte order mark is for, or None if the
+        block does not start with one.
+    """
+    for (bom, encoding) in _BOMS:
+        if block.startswith(bom):
+            return encoding
+    return None
+
+
+class _GuessingDecoder:
+    """ An incremental decoder for documents without a byte order mark.
+
+    The document is decoded as strict UTF-8 for as long as it is valid.  At
+    the first invalid byte, if everything before it was ASCII, the document is
+    taken to be in FALLBACK_ENCODING, and the rest is decoded in it (ASCII
+    reads the same in both, so this is as if the whole document had been).
+    Otherwise the document is taken to be UTF-8 with some bad bytes, which
+    are handled with the given error handler.  Either way, the guess doesn't
+    depend on how the document is split into blocks.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        self._decoder = codecs.getincrementaldecoder("utf-8")("strict")
+        self._guessing = True
+        self._ascii = True
+
+
+    def decode(self, data, final=False):
+        if not self._guessing:
+            return self._decoder.decode(data, final)
+        try:
+            text = self._decoder.decode(data, final)
+        except UnicodeDecodeError as error:
+            # The error's object is the data along with any bytes held back
+            #   from the previous block, and start is an offset into it
+            self._guessing = False
+            if self._ascii and error.object[:error.start].isascii():
+                self._decoder = codecs.getincrementaldecoder(FALLBACK_ENCODING)(self.errors)
+            else:
+                self._decoder = codecs.getincrementaldecoder("utf-8")(self.errors)
+            return self._decoder.decode(error.object, final)
+        self._ascii = self._ascii and text.isascii()
+        return text
+
+
+def read_blocks(filename, block_size=BLOCK_SIZE):
+    """Yields the contents of the file as bytes objects of up to block_size"""
+    with open(filename, "rb") as file:
+        block = file.read(block_size)
+        while block:
+            yield block
+            block = file.read(block_size)
+
+
+def read_text(filename, encoding=None, errors="replace", block_size=BLOCK_SIZE):
+    """ Yields the decoded contents of a file as a series of strings.
+
+    Args:
+        filename:   The name of the file to read
+        encoding:   The encoding of the file, or None to guess it: the one
+                    given by a byte order mark if there is one, otherwise
+                    UTF-8, unless the file is not valid UTF-8 and everything
+                    before its first invalid byte is ASCII, in which case
+                    FALLBACK_ENCODING
+        errors:     How to handle undecodable bytes; any error handler
+                    accepted by codecs, such as "strict", "replace" or "ignore"
+        block_size: The number of bytes to read at a time
+    Raises:
+        UnicodeDecodeError if errors is "strict" and the file is not valid in
+        the encoding.
+    """
+    decoder = None
+    for block in read_blocks(filename, block_size):
+        if decoder is None:
+            if encoding is None:
+                encoding = sniff_encoding(block)
+            if encoding is None:
+                decoder = _GuessingDecoder(errors)
+            else:
+                decoder = codecs.getincrementaldecoder(encoding)(errors)
+        text = decoder.decode(block)
+        if text:
+            yield text
+    if decoder is not None:
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
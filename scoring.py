@@ -0,0 +1,182 @@
+""" Strategies for scoring how well a document matches a set of languages.
+
+    A scorer prepares a structure for each reference language the first time
+    it sees it, and keeps it for later documents.  Scoring a document then
+    takes a single pass over the document's n-grams for each language.
+    Every scorer gives scores between 0 and 1, higher meaning a better match.
+"""
+from math import log, exp
+from language import dot_product
+
+
+class Scorer:
+    """ The base class of scorers; subclasses override prepare() and score().
+
+    To score a document against several languages, call document() once, then
+    score() for each language, then finish() with the list of results.
+    """
+
+    def __init__(self):
+        self._prepared = {}
+
+
+    def prepared(self, lang):
+        """Returns the structure prepared for the language, preparing it if needed"""
+        return lang.alphabet.cached(self._prepared, lang, lambda: self.prepare(lang))
+
+
+    def prepare(self, lang):
+        """Returns whatever structure score() needs for the reference language"""
+        raise NotImplementedError
+
+
+    def document(self, unknown):
+        """Returns whatever structure score() needs for the unknown Language"""
+        return unknown
+
+
+    def score(self, document, lang):
+        """Scores a document (from document()) against a reference Language"""
+        raise NotImplementedError
+
+
+    def finish(self, results):
+        """Adjusts the list of (language_name, score) tuples for one document"""
+        return results
+
+
+
+class CosineScorer(Scorer):
+    """ Scores by the cosine similarity of n-gram frequencies (see Language.compare)
+    """
+
+    def prepare(self, lang):
+        return (lang.profile(), lang.norm())
+
+
+    def score(self, document, lang):
+        (profile, lang_norm) = self.prepared(lang)
+        denom = document.norm() * lang_norm
+        if denom == 0:
+            return 0
+        return dot_product(document.profile(lang.alphabet), profile) / denom
+
+
+
+class RankScorer(Scorer):
+    """ Scores by the out-of-place distance between rankings of the top n-grams.
+
+    This is the measure of Cavnar and Trenkle, "N-Gram-Based Text
+    Categorization" (1994).  Only the most frequent n-grams of each profile are
+    ranked; the distance sums, for each of the document's top n-grams, how far
+    its rank is from its rank in the language, with n-grams missing from the
+    language counting as the maximum distance.  The score is one minus the
+    distance, scaled by that maximum.
+    """
+
+    def __init__(self, size=300):
+        """Creates a RankScorer which ranks the top size n-grams of each profile"""
+        Scorer.__init__(self)
+        self.size = size
+
+
+    def _top_grams(self, profile):
+        """Returns the packed n-grams of the profile, most frequent first"""
+        ranked = sorted(profile, key=lambda code: (-profile[code], code))
+        return ranked[:self.size]
+
+
+    def prepare(self, lang):
+        return {code: rank for (rank, code) in enumerate(self._top_grams(lang.profile()))}
+
+
+    def document(self, unknown):
+        # The document's ranking is translated into each alphabet it's scored in
+        return (unknown, self._top_grams(unknown.profile()), {})
+
+
+    def _translated(self, document, alphabet):
+        (unknown, ranked, translated) = document
+        def translate():
+            n = unknown.n_grams.n_max
+            table = unknown.alphabet.translation(alphabet)
+            codes = []
+            for code in ranked:
+                gram = [table[symbol] for symbol in unknown.alphabet.unpack(code, n)]
+                codes.append(None if None in gram else alphabet.pack(gram))
+            return codes
+        return alphabet.cached(translated, alphabet, translate)
+
+
+    def score(self, document, lang):
+        ranks = self.prepared(lang)
+        codes = self._translated(document, lang.alphabet)
+        if not codes:
+            return 0
+        distance = 0
+        for (rank, code) in enumerate(codes):
+            if code in ranks:
+                distance += abs(rank - ranks[code])
+            else:
+                distance += self.size
+        return 1 - distance / (self.size * len(codes))
+
+
+
+class BayesScorer(Scorer):
+    """ Scores by the probability of the document under each language's n-gram model.
+
+    Each language predicts the last character of an n-gram from the ones
+    before it, with add-one smoothing over its alphabet (plus one for unseen
+    characters).  The log-probabilities of the documents are turned into
+    probabilities of each language, assuming all languages are equally likely,
+    so the scores of a document add up to 1.
+    """
+
+    def prepare(self, lang):
+        """Returns log-probabilities of seen n-grams, of unseen n-grams by prefix, and otherwise"""
+        counts = lang.counts()
+        base = max(len(lang.alphabet), 1)
+        vocabulary = len(lang.alphabet) + 1
+        prefixes = {}
+        for code in counts:
+            prefix = code // base    # Removes the last character of the gram
+            prefixes[prefix] = prefixes.get(prefix, 0) + counts[code]
+        log_probs = {code: log((counts[code] + 1) / (prefixes[code // base] + vocabulary))
+                     for code in counts}
+        unseen = {prefix: log(1 / (prefixes[prefix] + vocabulary)) for prefix in prefixes}
+        return (log_probs, unseen, log(1 / vocabulary))
+
+
+    def document(self, unknown):
+        return (unknown, {})
+
+
+    def score(self, document, lang):
+        (log_probs, unseen, default) = self.prepared(lang)
+        (unknown, translated) = document
+        alphabet = lang.alphabet
+        counts = alphabet.cached(translated, alphabet, lambda: unknown.counts(alphabet))
+        base = alphabet.base()
+        # n-grams with characters the language's alphabet lacks were left out
+        missing = unknown.n_grams.counts[unknown.n_grams.n_max] - sum(counts.values())
+        total = missing * default
+        for code in counts:
+            if code in log_probs:
+                total += counts[code] * log_probs[code]
+            else:
+                total += counts[code] * unseen.get(code // base, default)
+        return total
+
+
+    def finish(self, results):
+        if not results:
+            return results
+        best = max(score for (name, score) in results)
+        weights = [(name, exp(score - best)) for (name, score) in results]
+        total = sum(weight for (name, weight) in weights)
+        return [(name, weight / total) for (name, weight) in weights]
+
+
+
+SCORERS = {"cosine": CosineScorer, "rank": RankScorer, "bayes": BayesScorer}
@@ -0,0 +1,64 @@
+""" Functions for saving a set of Languages to a snapshot that loads in one read.
+
+    A snapshot holds the same counts as a model bundle, but all of them in a
+    single marshal dump, with no file lists to validate, so loading it costs
+    one read and no imports beyond the Language classes.  It's meant for short
+    runs that classify a few strings with a fixed model (see quick.py); rebuild
+    it when the model changes.  Like anything marshalled, a snapshot can only
+    be read by the version of Python that wrote it.
+"""
+import marshal
+from alphabet import Alphabet
+from language import CachedLanguage
+
+VERSION = 1
+
+
+def save_snapshot(filename, langs):
+    """ Writes the counts of the given Languages to a snapshot file.
+
+    The file is written under a temporary name and then renamed, so readers
+    never see a partly written snapshot.
+    Args:
+        filename: The name of the snapshot file
+        langs:    A dict mapping language names to Language objects
+    """
+    alphabet = Alphabet()
+    for name in langs:
+        for symbol in langs[name].alphabet.symbols:
+            alphabet.index(symbol)
+    languages = {}
+    for name in langs:
+        lang = langs[name]
+        counts = lang.counts(alphabet)
+        header = {"n": lang.n_max, "byte_grams": lang.byte_grams, "norm": lang.norm(),
+                  "total": sum(counts.values())}
+        languages[name] = (header, counts)
+    snapshot = {"version": VERSION, "alphabet": str(alphabet), "languages": languages}
+    from bundle import atomic_write   # Not needed to read snapshots (see quick.py)
+    atomic_write(filename, lambda file: marshal.dump(snapshot, file))
+
+
+def read_snapshot(filename):
+    """ Reads the Languages of a snapshot file.
+
+    Returns:
+        A dict mapping language names to CachedLanguages, which share an
+        Alphabet.
+    Raises:
+        ValueError if the file is not a snapshot this version of Python can read.
+    """
+    with open(filename, "rb") as file:
+        data = file.read()
+    try:
+        snapshot = marshal.loads(data)
+    except (ValueError, EOFError, TypeError) as error:
+        raise ValueError("{} is not a valid snapshot".format(filename)) from error
+    if not isinstance(snapshot, dict) or snapshot.get("version") != VERSION:
+        raise ValueError("{} is not a valid snapshot".format(filename))
+    alphabet = Alphabet(snapshot["alphabet"])
+    langs = {}
+    for (name, (header, counts)) in snapshot["languages"].items():
+        header = dict(header, alphabet=snapshot["alphabet"])
+        langs[name] = CachedLanguage(header, counts.items, alphabet)
+    return langs